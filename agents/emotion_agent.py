@@ -1,26 +1,68 @@
 # agents/emotion_agent.py
-import torch
-from transformers import pipeline
 
 class EmotionAgent:
+    MODEL_ID = "j-hartmann/emotion-english-distilroberta-base"
+    MAX_LEN = 64
+
     def __init__(self):
+        # Imported here, not at module scope: torch + transformers cost
+        # ~1-3s of import time, which only the background loader should pay.
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self._torch = torch
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Device set to use {device.upper()}")
-        self.classifier = pipeline(
-            "text-classification",
-            model="j-hartmann/emotion-english-distilroberta-base",
-            return_all_scores=True,
-            device=0 if device == "cuda" else -1
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.MODEL_ID)
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            self.MODEL_ID
+        ).eval()
+        if device == "cuda":
+            self.model = self.model.cuda()
+        else:
+            # int8 linear layers roughly halve CPU inference latency for a
+            # one-shot classification; harmless to skip if unsupported.
+            try:
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            except Exception as e:
+                print(f"⚠️ Quantization unavailable, staying FP32: {e}")
+        self.id2label = self.model.config.id2label
+        self.device = device
+
+        # Every call runs the same (1, 64) shape through preallocated
+        # buffers, so kernel caches stay hot and nothing reallocates.
+        self._ids = torch.zeros(1, self.MAX_LEN, dtype=torch.long, device=device)
+        self._mask = torch.zeros(1, self.MAX_LEN, dtype=torch.long, device=device)
+
+        # Warm run so the first real phrase doesn't pay tracing/alloc cost.
+        self._classify("warmup")
+
+        # Users repeat phrases a lot in a coaching session; the model is
+        # deterministic, so cache results by normalized text.
+        self._cache = {}
+
+    def _classify(self, text):
+        enc = self.tokenizer(
+            text, max_length=self.MAX_LEN, padding="max_length",
+            truncation=True, return_tensors="pt",
         )
+        self._ids.copy_(enc.input_ids)
+        self._mask.copy_(enc.attention_mask)
+        with self._torch.inference_mode():
+            logits = self.model(self._ids, attention_mask=self._mask).logits
+        return self.id2label[int(logits.argmax(-1))].lower()
 
     def detect_emotion(self, text: str):
         if not text:
             return "neutral"
+        key = text.strip().lower()
+        if key in self._cache:
+            return self._cache[key]
         print("🔍 Analyzing emotional tone...")
-        results = self.classifier(text)[0]
-        # Sort by confidence
-        results.sort(key=lambda x: x["score"], reverse=True)
-        top_emotion = results[0]["label"].lower()
+        top_emotion = self._classify(text)
         print(f"🎭 Detected emotion: {top_emotion}")
+        self._cache[key] = top_emotion
         return top_emotion
-
@@ -0,0 +1,64 @@
+# agents/gemini_helper.py
+import os
+from dotenv import load_dotenv
+from utils.http_utils import make_session
+load_dotenv()
+
+_SINGLETON = None
+
+class GeminiHelper:
+    @classmethod
+    def instance(cls):
+        # One client (and one keep-alive session) per process, however many
+        # orchestrators or sessions get spun up.
+        global _SINGLETON
+        if _SINGLETON is None:
+            _SINGLETON = cls()
+        return _SINGLETON
+
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.api_base = os.getenv(
+            "GEMINI_API_BASE", "https://generativelanguage.googleapis.com"
+        )
+        self.model = "gemini-1.5-flash"
+        self.session = make_session()
+        self.session.headers.update({"x-goog-api-key": self.api_key or ""})
+        # (text, emotion) -> rewritten prompt; repeats within a session
+        # skip the API round-trip entirely.
+        self._cache = {}
+
+    def available(self):
+        return bool(self.api_key)
+
+    def build_cinematic_prompt(self, user_text, emotion="neutral"):
+        cache_key = (user_text.strip().lower(), emotion)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        url = f"{self.api_base}/v1beta/models/{self.model}:generateContent"
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": (
+                        "Rewrite this as a short, vivid cinematic prompt for a "
+                        "text-to-video model. One sentence, no preamble. "
+                        f"Scene: practicing {user_text}. "
+                        f"Emotional tone: {emotion}."
+                    )
+                }]
+            }]
+        }
+        response = self.session.post(url, json=payload, timeout=10)
+        if response.status_code in (401, 403):
+            # Auth problems surface on the first real request — no startup
+            # probe needed. Disable rewrites so we don't retry a dead key.
+            print("❌ Gemini authentication failed — check GEMINI_API_KEY. "
+                  "Using local prompts for this session.")
+            self.api_key = None
+        response.raise_for_status()
+        data = response.json()
+        prompt = data["candidates"][0]["content"]["parts"][0]["text"].strip()
+        self._cache[cache_key] = prompt
+        return prompt
@@ -1,32 +1,158 @@
 # agents/orchestrator.py
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+
+from requests import RequestException
+
 from agents.speech_agent import SpeechAgent
 from agents.emotion_agent import EmotionAgent
 from agents.video_agent import VideoAgent
 from agents.coach_agent import CoachAgent
+from agents.gemini_helper import GeminiHelper
+from utils.file_utils import TextLogger
+from utils.text_utils import EXIT_COMMANDS, cinematic_template, prep_utterance
 
 class Orchestrator:
     def __init__(self):
         self.speech_agent = SpeechAgent()
-        self.emotion_agent = EmotionAgent()
+        # Load the ~250MB emotion model in the background so mic setup and
+        # the welcome flow aren't blocked behind it.
+        self._emotion_future = ThreadPoolExecutor(max_workers=1).submit(EmotionAgent)
         self.video_agent = VideoAgent()
         self.coach = CoachAgent()
+        self.gemini = GeminiHelper.instance()
+
+        # Bounded buffer between the mic and the slow network stages, so
+        # capture keeps running while STT / video generation block.
+        self.audio_queue = queue.Queue(maxsize=4)
+        self._stop = threading.Event()
+        # Parallel STT for phrases that piled up during a long generation.
+        self._stt_pool = ThreadPoolExecutor(max_workers=4)
+        # Video generation runs out-of-band so the mic loop never blocks on
+        # it; the CPU-bound fallback render already lives in VideoAgent's
+        # worker process. The semaphore caps in-flight API jobs (quota),
+        # and pending futures are drained before the session ends.
+        max_videos = int(os.getenv("MAX_CONCURRENT_VIDEOS", "2"))
+        self._video_pool = ThreadPoolExecutor(max_workers=max_videos)
+        self._video_slots = threading.BoundedSemaphore(max_videos)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    @property
+    def emotion_agent(self):
+        return self._emotion_future.result()
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            audio = self.speech_agent.capture()
+            if audio is None:
+                continue
+            try:
+                self.audio_queue.put_nowait(audio)
+            except queue.Full:
+                # Drop the oldest phrase rather than stalling the mic.
+                try:
+                    self.audio_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.audio_queue.put_nowait(audio)
+        # This thread owns the mic stream, so it does the teardown —
+        # closing it from the main thread mid-read crashes PortAudio.
+        self.speech_agent.close()
 
     def run(self):
         print("🎤 Welcome to TheraVision — your AI Exposure Coach!")
         print("🧠 Preparing system...")
-        text = self.speech_agent.listen()
 
-        if not text:
-            print("⚠️ No speech detected. Exiting.")
-            return
+        producer = threading.Thread(target=self._capture_loop, daemon=True)
+        producer.start()
 
+        try:
+            running = True
+            while running:
+                for text in self._drain_and_recognize():
+                    if not text:
+                        continue
+                    lower, _ = prep_utterance(text)
+                    if lower in EXIT_COMMANDS:
+                        print("👋 Ending session. Great work today!")
+                        running = False
+                        break
+                    self._process(text)
+        except KeyboardInterrupt:
+            print("\n👋 Session interrupted. See you next time!")
+        finally:
+            self._stop.set()
+            # Nudge the capture path off the mic at the next chunk
+            # boundary; the producer then exits its loop and closes the
+            # stream on its own thread.
+            self.speech_agent.stop()
+            producer.join(timeout=2)
+            with self._pending_lock:
+                pending = list(self._pending)
+            if pending:
+                print(f"⏳ Waiting for {len(pending)} video(s) to finish...")
+                wait(pending)
+
+    def _drain_and_recognize(self):
+        # Block for one phrase, then grab whatever else queued up behind a
+        # slow generation and run the STT round-trips in parallel — N
+        # backlogged phrases cost ~one RTT instead of N.
+        audios = [self.audio_queue.get()]
+        while not self.audio_queue.empty() and len(audios) < 4:
+            try:
+                audios.append(self.audio_queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(audios) == 1:
+            return [self.speech_agent.recognize(audios[0])]
+        return list(self._stt_pool.map(self.speech_agent.recognize, audios))
+
+    def _process(self, text):
+        TextLogger.instance().append(text)
         emotion = self.emotion_agent.detect_emotion(text)
         print(f"🎭 Emotion detected: {emotion}")
 
         self.coach.respond_to_emotion(emotion, text)
 
-        video_path = self.video_agent.generate(
-            f"A realistic VR scene where the user practices {text}, with emotional tone {emotion}"
-        )
+        prompt = self._scene_prompt(text, emotion)
+        _, duration = prep_utterance(text)
+        # Blocks only once MAX_CONCURRENT_VIDEOS jobs are already running.
+        self._video_slots.acquire()
+        fut = self._video_pool.submit(self.video_agent.generate, prompt, duration)
+        with self._pending_lock:
+            self._pending.add(fut)
+        fut.add_done_callback(self._announce_video)
+
+    def _announce_video(self, fut):
+        self._video_slots.release()
+        with self._pending_lock:
+            self._pending.discard(fut)
+        try:
+            video_path = fut.result()
+        except Exception as e:
+            print(f"⚠️ Video generation failed: {e}")
+            return
         if video_path:
             print(f"🎥 Session video ready at: {video_path}")
+
+    def _scene_prompt(self, text, emotion):
+        # The local template is ready in microseconds; give Gemini a short
+        # deadline to deliver its nicer rewrite and otherwise don't wait —
+        # worst-case prompt latency is bounded at 0.8s.
+        local = cinematic_template(text, emotion)
+        if not self.gemini.available():
+            return local
+        fut = self._stt_pool.submit(self.gemini.build_cinematic_prompt, text, emotion)
+        try:
+            return fut.result(timeout=0.8)
+        except FutureTimeoutError:
+            fut.cancel()
+            return local
+        except (RequestException, ValueError, KeyError, IndexError) as e:
+            # Expected API failure modes only — a bug in the helper should
+            # not be silently papered over with the local template.
+            print(f"⚠️ Gemini rewrite failed, using local template: {e}")
+            return local
@@ -1,36 +1,219 @@
+import json
+import os
+import threading
+
 import speech_recognition as sr
 
+from utils.audio_utils import (
+    MicRingBuffer,
+    calibrate_energy_threshold,
+    resolve_microphone_index,
+    save_microphone_index,
+)
+from utils.text_utils import EXIT_COMMANDS
+
+# Lazily-loaded offline model for command words; False once load failed.
+# Locked: recognize runs on several STT pool threads at once, and an
+# unguarded check-then-create would construct (and download) the model
+# once per thread.
+_vosk_model = None
+_vosk_lock = threading.Lock()
+
+def _get_vosk_model():
+    global _vosk_model
+    with _vosk_lock:
+        if _vosk_model is None:
+            try:
+                import vosk
+                vosk.SetLogLevel(-1)
+                print("⏳ Loading offline command model "
+                      "(first use downloads it — this can take a while)...")
+                _vosk_model = vosk.Model(lang="en-us")
+            except Exception:
+                _vosk_model = False
+        return _vosk_model or None
+
+
+# Quantized whisper.cpp model for full offline transcription; False once
+# load failed, same latching and locking as the Vosk command model.
+_whisper_model = None
+_whisper_lock = threading.Lock()
+
+def _get_whisper_model():
+    global _whisper_model
+    with _whisper_lock:
+        if _whisper_model is None:
+            try:
+                from pywhispercpp.model import Model
+                print("⏳ Loading offline transcription model...")
+                _whisper_model = Model("tiny.en-q5_0")
+            except Exception:
+                _whisper_model = False
+        return _whisper_model or None
+
+
 class SpeechAgent:
     def __init__(self):
         self.recognizer = sr.Recognizer()
 
-        # 🎙️ Use your Realtek microphone (device index 9)
-        self.mic = sr.Microphone(device_index=14)
+        # 🎙️ Cached device index (set MIC_DEVICE_INDEX to override);
+        # None falls back to the system default mic.
+        device_index = resolve_microphone_index(sr.Microphone.list_microphone_names)
+        self.mic = sr.Microphone(device_index=device_index)
+        self._device_index = device_index
+        self._ring = None  # created on first capture; None again if it fails
 
-        # Optional: set a fixed threshold to avoid silent detection
+        # Start from a sane floor and let the recognizer adapt during the
+        # first ~0.5s of listening — no separate 1s calibration pass.
         self.recognizer.energy_threshold = 300
-        self.recognizer.dynamic_energy_threshold = False
+        self.recognizer.dynamic_energy_threshold = True
+        self._calibrated = False
+        self._mic_saved = False
+        self._stopping = threading.Event()
 
-    def listen(self):
-        import io
-        import wave
+    def capture(self):
+        # Mic-only half of listen(): returns raw AudioData, no network.
+        if self._stopping.is_set():
+            return None
+        # Preferred path: fixed ring buffer, zero per-chunk allocations.
+        if self._ring is not False:
+            try:
+                if self._ring is None:
+                    self._ring = MicRingBuffer(device_index=self._device_index)
+                if not self._calibrated:
+                    # Same RMS seeding as the fallback path, off the
+                    # ring's own stream; capture() keeps adapting the
+                    # threshold from there.
+                    self._ring.calibrate(self.recognizer, seconds=0.5)
+                    self._calibrated = True
+                print("🎧 Listening (speak now)...")
+                return self._after_capture(self._ring.capture(
+                    self.recognizer, timeout=5, phrase_time_limit=10,
+                    stop=self._stopping,
+                ))
+            except Exception as e:
+                print(f"⚠️ Ring-buffer capture unavailable ({e}), using default mic path.")
+                self._ring = False
 
         with self.mic as source:
+            if not self._calibrated:
+                # One vectorized RMS pass seeds the threshold; dynamic
+                # adjustment keeps tracking the room from there.
+                try:
+                    calibrate_energy_threshold(self.recognizer, source, seconds=0.5)
+                except Exception:
+                    pass
+                self._calibrated = True
             print("🎧 Listening (speak now)...")
-            audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+            try:
+                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+            except sr.WaitTimeoutError:
+                print("⚠️ No speech detected (timeout).")
+                return None
+        return self._after_capture(audio)
 
-        # Save the raw audio for debugging
-        with open("debug_audio.wav", "wb") as f:
-            f.write(audio.get_wav_data())
-        print("💾 Saved what I heard as debug_audio.wav")
+    def _after_capture(self, audio):
+        # Persist the working device index once the mic has proven itself,
+        # so the next session skips device probing (and the cached entry
+        # can be name-validated on reuse).
+        if audio is not None and not self._mic_saved:
+            self._mic_saved = True
+            try:
+                idx = self._device_index
+                if idx is None:
+                    import pyaudio
+                    pa = pyaudio.PyAudio()
+                    try:
+                        idx = int(pa.get_default_input_device_info()["index"])
+                    finally:
+                        pa.terminate()
+                names = sr.Microphone.list_microphone_names()
+                name = names[idx] if 0 <= idx < len(names) else None
+                save_microphone_index(idx, name)
+            except Exception:
+                pass
+        return audio
+
+    def recognize(self, audio):
+        # Network half of listen(): Google STT on already-captured audio.
+        if audio is None:
+            return None
+
+        # Save the raw audio for debugging (opt-in: ~300KB per phrase)
+        if os.getenv("DEBUG_AUDIO"):
+            with open("debug_audio.wav", "wb") as f:
+                f.write(audio.get_wav_data())
+            print("💾 Saved what I heard as debug_audio.wav")
+
+        # Command words like "exit" shouldn't pay a ~1s network RTT; try
+        # the offline model first and only fall through for real phrases.
+        command = self._match_command_offline(audio)
+        if command:
+            print(f"🗣️ You said: {command}")
+            return command
+
+        # Quantized whisper.cpp handles full phrases on-CPU in a few
+        # hundred ms with zero network variance, when it's installed.
+        text = self._transcribe_offline(audio)
+        if text:
+            print(f"🗣️ You said: {text}")
+            return text
 
         try:
+            # recognize_google already uploads FLAC (get_flac_data under
+            # the hood), so the wire format is compressed ~2x vs WAV.
             text = self.recognizer.recognize_google(audio, language="en-US")
             print(f"🗣️ You said: {text}")
             return text
         except sr.UnknownValueError:
             print("⚠️ Could not understand speech.")
             return None
-        except sr.WaitTimeoutError:
-            print("⚠️ No speech detected (timeout).")
+        except sr.RequestError as e:
+            # Network/STT-service trouble must not kill the session loop;
+            # skip this phrase like any other unusable capture.
+            print(f"⚠️ Speech service unavailable: {e}")
+            return None
+
+    def _transcribe_offline(self, audio):
+        model = _get_whisper_model()
+        if model is None:
+            return None
+        try:
+            import numpy as np
+            raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+            segments = model.transcribe(samples)
+            text = " ".join(seg.text.strip() for seg in segments).strip()
+        except Exception:
+            return None
+        return text or None
+
+    def _match_command_offline(self, audio):
+        model = _get_vosk_model()
+        if model is None:
+            return None
+        try:
+            import vosk
+            rec = vosk.KaldiRecognizer(model, 16000)
+            rec.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+            text = json.loads(rec.FinalResult()).get("text", "").strip()
+        except Exception:
             return None
+        return text if text in EXIT_COMMANDS else None
+
+    def stop(self):
+        # Ask the capture path to bail at the next chunk boundary. Safe
+        # from any thread — only close() touches the stream.
+        self._stopping.set()
+
+    def close(self):
+        # Release the PyAudio stream on session end. Must run on the
+        # thread that calls capture(): tearing the stream down under an
+        # in-flight read is a known PortAudio crash. The fallback mic is
+        # a context manager and never stays open between captures.
+        if self._ring:
+            self._ring.close()
+            self._ring = None
+
+    def listen(self):
+        return self.recognize(self.capture())
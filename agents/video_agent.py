@@ -1,40 +1,173 @@
 # agents/video_agent.py
-import os, requests, base64
+import os, time, random, shutil, base64, threading
+from concurrent.futures import Future
+from requests import RequestException
+from requests.adapters import Retry
 from dotenv import load_dotenv
+from utils import video_cache
+from utils.http_utils import make_session
+from utils.video_utils import render_text_video_with_pil, submit_render
 load_dotenv()
 
+# Jobs currently generating, keyed by normalized prompt — a burst of the
+# same phrase joins the first job instead of paying for a second one.
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
 class VideoAgent:
     def __init__(self):
         self.api_key = os.getenv("HUGGINGFACE_API_KEY")
         self.api_base = os.getenv("HUGGINGFACE_API_BASE", "https://router.huggingface.co")
         self.headers = {"Authorization": f"Bearer {self.api_key}"}
 
+        # Keep-alive session: reuses the TCP+TLS connection across calls
+        # instead of a fresh handshake per request.
+        self.session = make_session(
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=[502, 504]),
+        )
+        self.session.headers.update(self.headers)
+
         # Preferred VR-like model
         self.model = "ali-vilab/text-to-video-ms-1.7b"  # better for scene generation
 
-    def generate(self, prompt: str):
+    def generate(self, prompt: str, duration=6):
+        key = video_cache.cache_key(prompt, self.model)
+        with _INFLIGHT_LOCK:
+            fut = _INFLIGHT.get(key)
+            if fut is None:
+                fut = Future()
+                _INFLIGHT[key] = fut
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            print("⏳ Same prompt already generating — waiting for it.")
+            try:
+                return fut.result()
+            except Exception:
+                return None
+
+        try:
+            result = self._generate(prompt, duration)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.pop(key, None)
+
+    def _generate(self, prompt: str, duration=6):
         print(f"🎬 Generating immersive video for: {prompt}")
-        url = f"{self.api_base}/models/{self.model}"
 
+        # Per-prompt output name, so concurrent jobs never clobber each
+        # other's file (or poison the cache with the wrong video).
+        key = video_cache.cache_key(prompt, self.model)
+        out_path = os.path.join("generated_videos", f"session_{key[:12]}.mp4")
+
+        # Repeated prompts come straight off disk — no API call, no render.
+        cached = video_cache.get(prompt, self.model)
+        if cached is not None:
+            print(f"♻️ Reusing cached video for this prompt")
+            return self._materialize(cached, out_path)
+
+        url = f"{self.api_base}/models/{self.model}"
         payload = {"inputs": prompt}
-        response = requests.post(url, headers=self.headers, json=payload)
 
-        if response.status_code != 200:
-            print(f"❌ Error ({response.status_code}): {response.text}")
-            return None
+        # Start the local fallback render immediately; if the API call
+        # fails or times out, the replacement video is already done.
+        fallback_fut = submit_render(prompt, duration=duration)
+
+        # The router answers 503 while the model spins up. Back off
+        # exponentially with jitter and honor Retry-After instead of a
+        # fixed sleep, with a hard deadline so we never wait forever.
+        delay = 0.5
+        deadline = time.monotonic() + 300
+        response = None
+        timed_out = True
+        while time.monotonic() < deadline:
+            try:
+                response = self.session.post(url, json=payload, timeout=120, stream=True)
+            except RequestException as e:
+                # The adapter's Retry already did the transport-level
+                # retries; a failure here means the endpoint is down.
+                print(f"❌ Request failed: {e}")
+                return self._fallback(prompt, fallback_fut)
+            if response.status_code not in (202, 503):
+                timed_out = False
+                break
+            response.close()
+            # Jitter keeps concurrent generations from polling in lockstep.
+            # Retry-After may also be an HTTP-date; treat anything that
+            # isn't a plain number of seconds as absent.
+            try:
+                wait = float(response.headers.get("Retry-After", 0))
+            except ValueError:
+                wait = 0
+            wait = wait or delay * random.uniform(0.8, 1.2)
+            print(f"⏳ Model warming up, retrying in {wait:.1f}s...")
+            time.sleep(wait)
+            delay = min(delay * 1.7, 5.0)
 
+        if response is None or response.status_code != 200:
+            if timed_out:
+                print("❌ Timed out waiting for the video model to warm up.")
+            elif response is not None:
+                print(f"❌ Error ({response.status_code}): {response.text}")
+            return self._fallback(prompt, fallback_fut)
+
+        os.makedirs("generated_videos", exist_ok=True)
+        content_type = response.headers.get("Content-Type", "")
         try:
-            data = response.json()
-            if "video" in data:
-                video_bytes = base64.b64decode(data["video"])
-                os.makedirs("generated_videos", exist_ok=True)
-                out_path = os.path.join("generated_videos", "session.mp4")
+            if "json" in content_type:
+                data = response.json()
+                if "video" not in data:
+                    print("⚠️ No video data returned.")
+                    return self._fallback(prompt, fallback_fut)
                 with open(out_path, "wb") as f:
-                    f.write(video_bytes)
-                print(f"✅ Video saved to {out_path}")
-                return out_path
+                    f.write(base64.b64decode(data["video"]))
             else:
-                print("⚠️ No video data returned.")
+                # Raw video body: stream it to disk in 1MB chunks through
+                # os.write so the whole mp4 never sits in the Python heap.
+                self._stream_to_disk(response, out_path)
+            print(f"✅ Video saved to {out_path}")
+            video_cache.put(prompt, self.model, out_path)
+            fallback_fut.cancel()
+            return out_path
+        except (RequestException, OSError, ValueError, KeyError) as e:
+            # Only transport/decode failures mean "use the fallback";
+            # anything else is a bug and should surface.
+            print(f"⚠️ Download failed: {e}")
+        return self._fallback(prompt, fallback_fut)
+
+    def _materialize(self, cached_path, out_path):
+        os.makedirs("generated_videos", exist_ok=True)
+        if os.path.exists(out_path):
+            os.unlink(out_path)
+        try:
+            os.link(cached_path, out_path)
+        except OSError:
+            shutil.copy(cached_path, out_path)
+        return out_path
+
+    def _stream_to_disk(self, response, out_path):
+        # Copy the raw urllib3 stream straight into an unbuffered file in
+        # 1MB reads: one copy fewer than iter_content, and never more than
+        # a chunk of the mp4 in the Python heap. (os.sendfile can't apply
+        # here — the source is a TLS stream, not a plain socket fd.)
+        response.raw.decode_content = True
+        with open(out_path, "wb", buffering=0) as f:
+            shutil.copyfileobj(response.raw, f, length=1 << 20)
+
+    def _fallback(self, prompt: str, fut=None):
+        print("🪄 Falling back to local text rendering...")
+        try:
+            if fut is not None:
+                return fut.result()
+            return render_text_video_with_pil(prompt)
         except Exception as e:
-            print(f"⚠️ JSON parse error: {e}")
-        return None
+            print(f"⚠️ Fallback rendering failed: {e}")
+            return None
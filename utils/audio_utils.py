@@ -0,0 +1,169 @@
+# utils/audio_utils.py
+import json
+import os
+from pathlib import Path
+
+_MIC_CACHE = Path.home() / ".theravision" / "mic.json"
+
+
+def resolve_microphone_index(list_names):
+    """Pick the mic device index, avoiding PortAudio re-enumeration.
+
+    list_names is sr.Microphone.list_microphone_names (passed in so this
+    module doesn't import speech_recognition). Returns None for the
+    system default device.
+    """
+    env_idx = os.getenv("MIC_DEVICE_INDEX")
+    if env_idx is not None:
+        idx = int(env_idx)
+        _save_mic_cache(idx, None)
+        return idx
+
+    # Enumerating devices probes each one (~50-200ms); trust the cache as
+    # long as the device name at the cached index hasn't changed.
+    cached = _load_mic_cache()
+    if cached is not None:
+        idx, name = cached
+        if name is None:
+            return idx
+        names = list_names()
+        if 0 <= idx < len(names) and names[idx] == name:
+            return idx
+
+    return None
+
+
+def save_microphone_index(idx, name=None):
+    _save_mic_cache(idx, name)
+
+
+def _load_mic_cache():
+    try:
+        data = json.loads(_MIC_CACHE.read_text())
+        return data["idx"], data.get("name")
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_mic_cache(idx, name):
+    try:
+        _MIC_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        _MIC_CACHE.write_text(json.dumps({"idx": idx, "name": name}))
+    except OSError:
+        pass
+
+
+def calibrate_energy_threshold(recognizer, source, seconds=2.0, ratio=1.5):
+    """Set the recognizer threshold from one vectorized RMS over a short
+    capture, instead of speech_recognition's per-chunk Python loop."""
+    import numpy as np
+
+    raw = source.stream.read(int(source.SAMPLE_RATE * seconds))
+    samples = np.frombuffer(raw, dtype=np.int16)
+    if not len(samples):
+        return recognizer.energy_threshold
+    rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+    recognizer.energy_threshold = rms * ratio
+    return recognizer.energy_threshold
+
+
+class MicRingBuffer:
+    """Microphone capture into one preallocated int16 scratch buffer.
+
+    recognizer.listen allocates fresh bytes per chunk, which builds GC
+    pressure over a long session; here PyAudio chunks land in slices of a
+    fixed numpy buffer and only the trimmed phrase is copied out.
+    """
+
+    CHUNK = 1024
+
+    def __init__(self, device_index=None, rate=16000, max_seconds=20):
+        import numpy as np
+        import pyaudio
+
+        self._np = np
+        self.rate = rate
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16, channels=1, rate=rate, input=True,
+            input_device_index=device_index, frames_per_buffer=self.CHUNK,
+        )
+        self._buf = np.zeros(rate * max_seconds, dtype=np.int16)
+
+    def _read_chunk(self, offset):
+        raw = self._stream.read(self.CHUNK, exception_on_overflow=False)
+        chunk = self._np.frombuffer(raw, dtype=self._np.int16)
+        end = min(offset + len(chunk), len(self._buf))
+        self._buf[offset:end] = chunk[: end - offset]
+        return end
+
+    def _rms(self, start, end):
+        window = self._buf[start:end].astype(self._np.float32)
+        return float(self._np.sqrt(self._np.mean(window ** 2))) if end > start else 0.0
+
+    def calibrate(self, recognizer, seconds=0.5, ratio=1.5):
+        """Seed recognizer.energy_threshold from the ring's own stream —
+        the counterpart of calibrate_energy_threshold for this path."""
+        end = 0
+        while end < int(self.rate * seconds):
+            end = self._read_chunk(end)
+        rms = self._rms(0, end)
+        if rms:
+            recognizer.energy_threshold = rms * ratio
+        return recognizer.energy_threshold
+
+    def capture(self, recognizer, timeout=5, phrase_time_limit=10,
+                trailing_silence=0.8, stop=None):
+        """Return one phrase as sr.AudioData, or None on timeout (or as
+        soon as the optional stop event is set)."""
+        import speech_recognition as sr
+
+        # Wait for speech: roll chunks through the front of the buffer,
+        # easing the threshold toward the ambient level while the room is
+        # quiet — the same damped tracking recognizer.listen does.
+        energy_threshold = recognizer.energy_threshold
+        waited = 0.0
+        chunk_secs = self.CHUNK / self.rate
+        damping = 0.15 ** chunk_secs
+        while True:
+            if stop is not None and stop.is_set():
+                return None
+            end = self._read_chunk(0)
+            rms = self._rms(0, end)
+            if rms >= energy_threshold:
+                break
+            if recognizer.dynamic_energy_threshold:
+                energy_threshold = (energy_threshold * damping
+                                    + rms * 1.5 * (1 - damping))
+                recognizer.energy_threshold = energy_threshold
+            waited += chunk_secs
+            if waited >= timeout:
+                return None
+
+        # Record until trailing silence or the phrase limit, in place.
+        write = end
+        silent = 0.0
+        limit = min(len(self._buf), int(phrase_time_limit * self.rate))
+        silence_window = int(trailing_silence * self.rate)
+        while write < limit:
+            if stop is not None and stop.is_set():
+                break
+            new_end = self._read_chunk(write)
+            if new_end == write:
+                break
+            write = new_end
+            if self._rms(max(0, write - silence_window), write) < energy_threshold:
+                silent += chunk_secs
+                if silent >= trailing_silence:
+                    break
+            else:
+                silent = 0.0
+
+        return sr.AudioData(self._buf[:write].tobytes(), self.rate, 2)
+
+    def close(self):
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        finally:
+            self._pa.terminate()
@@ -1,6 +1,57 @@
+import atexit
 import os
+import threading
+from datetime import datetime
 
 def save_text(text, path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         f.write(text)
+
+
+class TextLogger:
+    """Buffered append-only log: one open file, one write per flush,
+    instead of open/write/close per utterance."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    FLUSH_INTERVAL = 5.0
+
+    @classmethod
+    def instance(cls, path="recognized_text.txt"):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(path)
+            return cls._instance
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8", buffering=8192)
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+        self._schedule_flush()
+
+    def append(self, text):
+        with self._lock:
+            if not self._closed:
+                self._file.write(f"{datetime.now()}: {text}\n")
+
+    def _schedule_flush(self):
+        if self._closed:
+            return
+        timer = threading.Timer(self.FLUSH_INTERVAL, self._flush)
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self):
+        with self._lock:
+            if not self._closed:
+                self._file.flush()
+        self._schedule_flush()
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._file.close()
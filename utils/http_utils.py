@@ -0,0 +1,21 @@
+# utils/http_utils.py
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+
+def make_session(max_retries=None, pool_connections=8, pool_maxsize=16):
+    """Session with persistent keep-alive pooling for the API clients.
+
+    One TLS handshake per host per process instead of per call; HTTP/2
+    multiplexing would need httpx, which isn't a dependency, so HTTP/1.1
+    keep-alive is the pooling layer here.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries if max_retries is not None else Retry(total=0),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
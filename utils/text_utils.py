@@ -0,0 +1,30 @@
+# utils/text_utils.py
+from functools import lru_cache
+
+
+@lru_cache(maxsize=512)
+def cinematic_template(user_text, emotion="neutral"):
+    # Deterministic on its inputs, so repeats during a session are free.
+    return (
+        f"A realistic VR scene where the user practices {user_text}, "
+        f"with emotional tone {emotion}"
+    )
+
+# Session commands, hashed once at import — O(1) membership, no per-call
+# list literals.
+EXIT_COMMANDS = frozenset({"exit", "quit", "stop"})
+
+
+@lru_cache(maxsize=512)
+def prep_utterance(text):
+    """One-stop post-processing for a recognized phrase: lowercased form
+    for command dispatch plus the reading-time video duration.
+
+    Pure Python on purpose — the repo has no build backend for a
+    Cython/numba extension, and the cache makes repeats a single dict
+    lookup either way. (Timestamping stays in TextLogger, which must not
+    be cached.)
+    """
+    lower = text.strip().lower()
+    duration = max(3, int(len(text) * 0.3))
+    return lower, duration
@@ -0,0 +1,72 @@
+# utils/video_cache.py
+import hashlib
+import json
+import re
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".cache" / "text_to_video"
+MAX_ENTRIES = 64
+
+# Small in-memory LRU in front of the disk cache so hot keys skip the stat.
+_hot = OrderedDict()
+
+
+def _key(prompt, model):
+    normalized = re.sub(r"[^\w\s]", "", prompt.lower())
+    normalized = " ".join(normalized.split())
+    return hashlib.sha256(f"{normalized}|{model}".encode()).hexdigest()
+
+
+def get(prompt, model):
+    key = _key(prompt, model)
+    if key in _hot:
+        _hot.move_to_end(key)
+        path = _hot[key]
+        if path.exists():
+            return path
+        del _hot[key]
+    path = CACHE_DIR / f"{key}.mp4"
+    if not path.exists():
+        return None
+    _touch_meta(path)
+    _hot[key] = path
+    _hot.move_to_end(key)
+    while len(_hot) > MAX_ENTRIES:
+        _hot.popitem(last=False)
+    return path
+
+
+def put(prompt, model, video_path):
+    key = _key(prompt, model)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = CACHE_DIR / f"{key}.mp4"
+        shutil.copy(video_path, path)
+        _touch_meta(path)
+        _hot[key] = path
+        return path
+    except OSError:
+        return None
+
+
+def _touch_meta(path):
+    meta_path = path.with_suffix(".json")
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        meta = {"hits": 0}
+    meta["hits"] = meta.get("hits", 0) + 1
+    meta["ts"] = time.time()
+    try:
+        meta_path.write_text(json.dumps(meta))
+    except OSError:
+        pass
+
+
+def cache_key(prompt, model):
+    """Public key for callers that need the same normalization (e.g. the
+    in-flight coalescer) without touching the cache."""
+    return _key(prompt, model)
@@ -0,0 +1,213 @@
+# utils/video_utils.py
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.video_cache import CACHE_DIR
+
+WIDTH, HEIGHT = 1280, 720
+BG_COLOR = (15, 15, 35)
+TEXT_COLOR = (240, 240, 240)
+FONT_SIZE = 50
+
+
+_ENCODE_POOL = None
+_ENCODE_POOL_LOCK = threading.Lock()
+
+def _encode_pool():
+    # Shared worker processes for all render requests — ffmpeg encodes are
+    # CPU-bound, so N queued utterances use the cores instead of a thread.
+    # Locked: submit_render is called from the video workers concurrently,
+    # and a check-then-create race would leak a whole second pool.
+    global _ENCODE_POOL
+    with _ENCODE_POOL_LOCK:
+        if _ENCODE_POOL is None:
+            _ENCODE_POOL = ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) // 2)
+            )
+        return _ENCODE_POOL
+
+
+def submit_render(text, output_path=None, duration=6, fps=24):
+    """Run render_text_video_with_pil in the shared pool; returns a Future."""
+    return _encode_pool().submit(
+        render_text_video_with_pil, text, output_path, duration, fps
+    )
+
+
+_ENCODER = None
+
+def _pick_encoder():
+    # Probe ffmpeg once for a hardware H.264 encoder; fixed-function
+    # silicon encodes 5-20x faster than libx264 on CPU. (h264_vaapi is
+    # deliberately absent: it needs a device/hwupload pipeline this
+    # renderer doesn't build.)
+    global _ENCODER
+    if _ENCODER is None:
+        try:
+            out = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                 capture_output=True, text=True).stdout
+        except OSError:
+            out = ""
+        for name in ("h264_nvenc", "h264_qsv", "h264_videotoolbox"):
+            if name in out and _encoder_works(name):
+                _ENCODER = name
+                break
+        else:
+            _ENCODER = "libx264"
+    return _ENCODER
+
+
+def _encoder_works(name):
+    # -encoders only proves the encoder was compiled in — stock distro
+    # builds list nvenc with no GPU in sight. One black test frame proves
+    # the driver behind it actually answers.
+    try:
+        return subprocess.run(
+            ["ffmpeg", "-hide_banner", "-f", "lavfi",
+             "-i", "color=black:s=320x240:d=0.1",
+             "-frames:v", "1", *_encoder_args(name), "-f", "null", "-"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ).returncode == 0
+    except OSError:
+        return False
+
+
+def _encoder_args(encoder):
+    if encoder == "h264_nvenc":
+        return ["-c:v", encoder, "-preset", "p1"]
+    if encoder == "libx264":
+        return ["-c:v", encoder, "-preset", "ultrafast"]
+    return ["-c:v", encoder]
+
+
+@lru_cache(maxsize=1)
+def _load_font():
+    # FreeType font loading walks the filesystem; do it once per process.
+    for name in ("DejaVuSans-Bold.ttf", "Arial-Bold.ttf", "arialbd.ttf"):
+        try:
+            return ImageFont.truetype(name, FONT_SIZE)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=32)
+def _render_card(text):
+    # The rendered card depends only on the text (size/colors are module
+    # constants), so repeats across utterances reuse the same image.
+    img = Image.new("RGB", (WIDTH, HEIGHT), BG_COLOR)
+    draw = ImageDraw.Draw(img)
+    font = _load_font()
+    for x, y, ln in _layout_text(text, font):
+        draw.text((x, y), ln, font=font, fill=TEXT_COLOR)
+    return img
+
+
+def _layout_text(text, font, max_width=WIDTH - 120):
+    # Wrap by pixel width and position every line once, so the frame
+    # renderer never touches the FreeType metrics again. getbbox replaces
+    # draw.textsize, which was removed in Pillow 10.
+    words = text.split() or [""]
+    lines, current = [], words[0]
+    for word in words[1:]:
+        candidate = f"{current} {word}"
+        if font.getbbox(candidate)[2] <= max_width:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    lines.append(current)
+
+    line_height = FONT_SIZE + 12
+    y = (HEIGHT - line_height * len(lines)) // 2
+    layout = []
+    for ln in lines:
+        bbox = font.getbbox(ln)
+        x = (WIDTH - (bbox[2] - bbox[0])) // 2
+        layout.append((x, y, ln))
+        y += line_height
+    return layout
+
+
+def render_text_video_with_pil(text, output_path=None, duration=6, fps=24):
+    if output_path is None:
+        # Name by text hash, like the fragment cache: concurrent renders
+        # of different prompts can never land on the same file (a
+        # timestamp only has one-second resolution), and re-renders of
+        # the same text overwrite with identical bytes.
+        os.makedirs("videos", exist_ok=True)
+        digest = hashlib.sha256(text.encode()).hexdigest()[:12]
+        output_path = os.path.join("videos", f"scene_{digest}.mp4")
+
+    # The text never changes, so render a single frame up front instead of
+    # re-drawing it duration*fps times.
+    img = _render_card(text)
+
+    # Encode each unique text once as a 1s fragment, then extend to the
+    # requested duration with a container remux (-c copy) — repeats pay
+    # milliseconds of muxing instead of seconds of encoding.
+    try:
+        frag = _fragment_for(img, text, fps)
+        _remux_loop(frag, output_path, duration)
+    except (OSError, subprocess.CalledProcessError):
+        # One input frame looped by ffmpeg: still near-free to encode.
+        _encode_still(img, output_path, duration, fps)
+    print(f"🎞️ Fallback video written to {output_path}")
+    return output_path
+
+
+def _fragment_for(img, text, fps):
+    frag = CACHE_DIR / f"frag_{hashlib.sha256(text.encode()).hexdigest()}.mp4"
+    if not frag.exists():
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _encode_still(img, frag, 1, fps)
+    return frag
+
+
+def _remux_loop(frag, output_path, duration):
+    subprocess.run(
+        ["ffmpeg", "-y", "-stream_loop", "-1", "-fflags", "+genpts",
+         "-i", str(frag), "-t", str(duration), "-c", "copy", str(output_path)],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def _encode_still(img, output_path, duration, fps):
+    global _ENCODER
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
+        tmp_png = tmp.name
+    try:
+        img.save(tmp_png)
+        encoder = _pick_encoder()
+        try:
+            _run_still(tmp_png, output_path, duration, fps, encoder)
+        except subprocess.CalledProcessError:
+            if encoder == "libx264":
+                raise
+            # The probe can still go stale at encode time (driver gone,
+            # device busy); the fallback renderer must not die with it.
+            _ENCODER = "libx264"
+            _run_still(tmp_png, output_path, duration, fps, "libx264")
+    finally:
+        os.unlink(tmp_png)
+
+
+def _run_still(tmp_png, output_path, duration, fps, encoder):
+    cmd = [
+        "ffmpeg", "-y",
+        "-loop", "1", "-i", tmp_png,
+        "-t", str(duration), "-r", str(fps),
+        *_encoder_args(encoder),
+    ]
+    if encoder == "libx264":
+        cmd += ["-tune", "stillimage"]
+    cmd += ["-pix_fmt", "yuv420p", str(output_path)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)